@@ -20,7 +20,6 @@
 import time
 import typing
 import bittensor as bt
-import hashlib
 # Bittensor Miner Template:
 import template
 
@@ -58,7 +57,7 @@ class Miner(BaseMinerNeuron):
         the miner's intended operation. This method demonstrates a basic transformation of input data.
         """
         bt.logging.info(f"Received ->  {synapse.nounce_input}")
-        synapse.generated_hash = hashlib.sha256(str(synapse.nounce_input).encode()).hexdigest()
+        synapse.generated_hash = template.protocol.nounce_digest(synapse.nounce_input).hex()
 
         bt.logging.debug(f"Response ->  {synapse.generated_hash}")
         return synapse
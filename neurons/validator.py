@@ -4,27 +4,39 @@
 
 import os
 import time
+import asyncio
 import torch
 import traceback
 import argparse
+import json
 import pickle
-import hashlib
+import struct
 import random
 import bittensor as bt
 
 import template
-from template.validator import forward
-
-from template.base.validator import BaseValidatorNeuron
+from template.protocol import nounce_digest, DIGEST_SIZE
+from template.validator import score_responses
 
 TEST_SET_FILENAME = "validationset.sav"
+TEST_SET_VERSION = 1
+MAX_NOUNCE = 10000
+QUERY_CHUNK_SIZE = 10
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
 
 
 def get_config():
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--seed', default=None, type = int, help='Seed to be used in random generation.')
-    parser.add_argument('--validation_lot', default=10, help='Length of validation set.')
+    parser.add_argument('--validation_lot', default=10, type = positive_int, help='Length of validation set.')
+    parser.add_argument('--weights_every', default=5, type = positive_int, help='Number of validation numbers scored between weight updates.')
     parser.add_argument( '--netuid', type = int, default = 1, help = "The chain subnet uid." )
 
     
@@ -33,6 +45,10 @@ def get_config():
     bt.wallet.add_args(parser)
     config =  bt.config(parser)
 
+    # Keys are distinct nounces in 0..MAX_NOUNCE, so the set cannot be larger.
+    if config.validation_lot > MAX_NOUNCE + 1:
+        parser.error(f"--validation_lot can be at most {MAX_NOUNCE + 1}, got {config.validation_lot}")
+
     config.full_path = os.path.expanduser(
         "{}/{}/{}/netuid{}/{}".format(
             config.logging.logging_dir,
@@ -49,40 +65,124 @@ def get_config():
 
 
 def generate_key_value_pairs(seed, N):
-    random.seed(seed)
-    key_value_pairs = {}
-    for i in range(N):
-        key = random.randint(0, 10000)
-        value = hashlib.sha256(str(key).encode()).hexdigest()
-        key_value_pairs[key] = value
-    return key_value_pairs
-
-
-def validation_set(*, seed: int|None, length:int|None) -> dict[int, str]:
+    # Sampling without replacement yields exactly N distinct keys.
+    keys = random.Random(seed).sample(range(MAX_NOUNCE + 1), N)
+    return {key: nounce_digest(key) for key in keys}
+
+
+def save_validation_set(filename, seed, key_value_pairs):
+    # A one-line JSON header followed by every key as uint16 and then every
+    # raw digest back to back.
+    header = {"version": TEST_SET_VERSION, "seed": seed, "n": len(key_value_pairs)}
+    keys = struct.pack(f"<{len(key_value_pairs)}H", *key_value_pairs.keys())
+    # Written aside and swapped in so an interrupted save never leaves a
+    # truncated set behind.
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, 'wb') as file:
+        file.write(json.dumps(header).encode() + b"\n" + keys + b"".join(key_value_pairs.values()))
+    os.replace(tmp_filename, filename)
+
+
+def load_validation_set(file, seed=None):
+    # Returns the saved seed and its pairs, or no pairs when the saved seed
+    # differs from `seed` so a stale payload is never decoded.
+    line = file.readline()
+
+    if not line.startswith(b"{"):
+        # Sets written before the binary format are pickled, with hex digests.
+        file.seek(0)
+        saved_seed, key_value_pairs = pickle.load(file)
+        if seed is not None and saved_seed != seed:
+            return saved_seed, None
+        key_value_pairs = {
+            key: bytes.fromhex(value) if isinstance(value, str) else value
+            for key, value in key_value_pairs.items()
+        }
+        return saved_seed, key_value_pairs
+
+    header = json.loads(line)
+    if header["version"] != TEST_SET_VERSION:
+        raise ValueError(f"Unsupported validation set version: {header['version']}")
+    if seed is not None and header["seed"] != seed:
+        return header["seed"], None
+
+    n = header["n"]
+    data = file.read()
+    keys = struct.unpack_from(f"<{n}H", data)
+    digests = memoryview(data)[2 * n:]
+    key_value_pairs = {
+        key: bytes(digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE])
+        for i, key in enumerate(keys)
+    }
+    return header["seed"], key_value_pairs
+
+
+def validation_set(*, seed: int|None, length:int|None) -> dict[int, bytes]:
     filename = TEST_SET_FILENAME
-    if not os.path.exists(filename):
-        bt.logging.info("Reading validation test")
+    try:
+        file = open(filename, 'rb')
+    except FileNotFoundError:
+        bt.logging.info("Generating validation set")
         key_value_pairs = generate_key_value_pairs(seed, length)
-        with open(filename, 'wb') as file:
-            pickle.dump((seed, key_value_pairs), file)
+        save_validation_set(filename, seed, key_value_pairs)
         return key_value_pairs
 
-    with open(filename, 'rb') as file:
-        saved_seed, key_value_pairs = pickle.load(file)
-        bt.logging.debug(f"saved seed: {saved_seed}")
+    with file:
+        saved_seed, key_value_pairs = load_validation_set(file, seed)
+    bt.logging.debug(f"saved seed: {saved_seed}")
 
-    if seed and saved_seed != seed:
+    if key_value_pairs is None:
         bt.logging.info("Seed has changed, regenerating set")
         key_value_pairs = generate_key_value_pairs(seed, length)
-        with open(filename, 'wb') as file:
-            pickle.dump((seed, key_value_pairs), file)       
+        save_validation_set(filename, seed, key_value_pairs)
 
     return key_value_pairs
 
 
+async def query_validation_set(dendrite, axons, numbers):
+    # The numbers are sent together so the per-query network latencies overlap
+    # instead of adding up. A failed query comes back as its exception so
+    # only that number is skipped.
+    responses = await asyncio.gather(*[
+        dendrite.forward(
+            axons,
+            template.protocol.ToHash(nounce_input=number),
+            deserialize = False,
+        )
+        for number in numbers
+    ], return_exceptions = True)
+    return responses
+
+
+def replaced_uids(hotkeys, current_hotkeys):
+    # Uids whose hotkey changed, or which left the metagraph, since `hotkeys`
+    # was taken.
+    return torch.tensor([
+        uid >= len(current_hotkeys) or current_hotkeys[uid] != hotkey
+        for uid, hotkey in enumerate(hotkeys)
+    ], dtype=torch.bool)
+
+
+def set_weights(subtensor, wallet, netuid, uids, scores):
+    weights = torch.nn.functional.normalize(scores, p=1.0, dim=0)
+    bt.logging.info(f"Setting weights: {weights}")
+
+    success, message = subtensor.set_weights(
+        netuid = netuid,
+        wallet = wallet,
+        uids = uids,
+        weights = weights,
+        wait_for_inclusion = False
+    )
+    if success: bt.logging.success('Submitted weights.')
+    else: bt.logging.error(f'Failed to submit weights: {message}')
+
 
 def main(config):
     validation_hash = validation_set(seed=config.seed, length=config.validation_lot)        
+    # The set is fixed from here on; keys and digests are walked side by side.
+    numbers = tuple(validation_hash.keys())
+    hashes = tuple(validation_hash.values())
     bt.logging(config=config, logging_dir=config.full_path)
     bt.logging.info(f"Running validator for subnet: {config.netuid} on network: {config.subtensor.chain_endpoint} with config:")
     bt.logging.info(config)
@@ -109,6 +209,11 @@ def main(config):
         bt.logging.info(f"Running validator on uid: {my_subnet_uid}")
 
 
+    # Bound once and only rebound when a resync finds the metagraph changed.
+    axons = metagraph.axons
+    uids = metagraph.uids.clone()
+    hotkeys = list(metagraph.hotkeys)
+
     bt.logging.info("Building validation weights.")
     alpha = 0.9
     scores = torch.ones_like(metagraph.S, dtype=torch.float32)
@@ -116,49 +221,70 @@ def main(config):
 
     bt.logging.info("Starting validator loop.")
 
-    for number, hash in validation_hash.items():
-        try:
-            bt.logging.info(f"sending {number} to hash")
-            responses = dendrite.query(
-                metagraph.axons,
-                template.protocol.ToHash(nounce_input=number),
-                deserialize = False, 
-            )
-
-            bt.logging.info(f"Received responses: {responses}")
-
-            for i, resp_i in enumerate(responses):
-                score = 0
-                bt.logging.debug(f"Response: {repr(resp_i)}")
-                if  resp_i.generated_hash == hash:
-                    score = 1
-                bt.logging.debug(f"Score: {score}")
-                scores[i] = alpha * score + (1 - alpha) * 0
-
-                if i % 2 == 0:
-                    weights = torch.nn.functional.normalize(scores, p=1.0, dim=0)
-                    bt.logging.info(f"Setting weights: {weights}")
-
-                    result = subtensor.set_weights(
-                        netuid = config.netuid,
-                        wallet = wallet,
-                        uids = metagraph.uids,
-                        weights = weights,
-                        wait_for_inclusion = True
-                    )
-                    if result: bt.logging.success('Successfully set weights.')
-                    else: bt.logging.error('Failed to set weights.') 
-
-            metagraph = subtensor.metagraph(config.netuid)
-            time.sleep(bt.__blocktime__)
-
-        except RuntimeError as e:
-            bt.logging.error(e)
-            traceback.print_exc()
-
-        except KeyboardInterrupt:
-            bt.logging.success("Keyboard interrupt detected. Exiting validator.")
-            exit()
+    # The dendrite session and the subtensor websocket are opened once and
+    # reused by every query and weight update until the run ends.
+    try:
+        loop = asyncio.get_event_loop()
+        # Numbers are queried a chunk at a time, which bounds both the requests
+        # in flight and the responses held in memory.
+        for start in range(0, len(numbers), QUERY_CHUNK_SIZE):
+            chunk = numbers[start:start + QUERY_CHUNK_SIZE]
+            queried_hotkeys = hotkeys
+            try:
+                bt.logging.info(f"sending {len(chunk)} numbers to hash")
+                chunk_responses = loop.run_until_complete(
+                    query_validation_set(dendrite, axons, chunk)
+                )
+            except KeyboardInterrupt:
+                bt.logging.success("Keyboard interrupt detected. Exiting validator.")
+                exit()
+
+            chunk_hashes = hashes[start:start + QUERY_CHUNK_SIZE]
+            for step, (number, hash, responses) in enumerate(zip(chunk, chunk_hashes, chunk_responses), start=start + 1):
+                try:
+                    if isinstance(responses, BaseException):
+                        bt.logging.error(f"Query for {number} failed: {responses!r}")
+                    else:
+                        hits = score_responses(responses, hash)
+                        bt.logging.info(f"{int(hits.sum())}/{len(responses)} correct responses for {number}")
+                        if queried_hotkeys is not hotkeys:
+                            # The metagraph changed after this chunk was sent, so
+                            # answers from a uid's previous owner are not credited.
+                            hits.masked_fill_(replaced_uids(queried_hotkeys, hotkeys), 0)
+                        n = min(len(hits), len(scores))
+                        scores[:n].mul_(1 - alpha).add_(hits[:n], alpha=alpha)
+
+                    # Weights are submitted without waiting for inclusion; the
+                    # block pause only keeps consecutive updates in separate blocks.
+                    if step % config.weights_every == 0 or step == len(numbers):
+                        # The metagraph is only refreshed when weights are about
+                        # to be submitted, which is the one place it is read.
+                        metagraph.sync(subtensor = subtensor, lite = True)
+                        axons = metagraph.axons
+                        if metagraph.hotkeys != hotkeys:
+                            # A replaced uid restarts from 0 and is then scored
+                            # on its new owner's answers; new uids join at 0.
+                            scores.masked_fill_(replaced_uids(hotkeys, metagraph.hotkeys), 0)
+                            size = len(metagraph.hotkeys)
+                            if size > len(scores):
+                                scores = torch.cat([scores, torch.zeros(size - len(scores))])
+                            scores = scores[:size]
+                            uids = metagraph.uids.clone()
+                            hotkeys = list(metagraph.hotkeys)
+
+                        set_weights(subtensor, wallet, config.netuid, uids, scores)
+                        time.sleep(bt.__blocktime__)
+
+                except RuntimeError as e:
+                    bt.logging.error(e)
+                    traceback.print_exc()
+
+                except KeyboardInterrupt:
+                    bt.logging.success("Keyboard interrupt detected. Exiting validator.")
+                    exit()
+    finally:
+        dendrite.close_session()
+        subtensor.substrate.close()
 
 
 if __name__ == "__main__":
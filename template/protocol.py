@@ -19,6 +19,10 @@
 
 import typing
 import bittensor as bt
+from hashlib import sha256
+
+# Size in bytes of the raw digests returned by nounce_digest.
+DIGEST_SIZE = 32
 
 # TODO(developer): Rewrite with your protocol definition.
 
@@ -74,3 +78,15 @@ class ToHash(bt.Synapse):
         5
         """
         return self.generated_hash
+
+
+def nounce_digest(nounce: int) -> bytes:
+    """
+    Computes the SHA-256 digest of a nounce. Miners answer a ToHash request with
+    its hex encoding and validators check the answers against it, so both sides
+    share this single definition.
+
+    Returns:
+    - bytes: The raw 32-byte digest of the decimal representation of the nounce.
+    """
+    return sha256(b"%d" % nounce).digest()
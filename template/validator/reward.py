@@ -18,7 +18,9 @@
 # DEALINGS IN THE SOFTWARE.
 
 import torch
-from typing import List
+from typing import List, Optional
+
+from template.protocol import DIGEST_SIZE
 
 
 def reward(query: int, response: int) -> float:
@@ -52,3 +54,42 @@ def get_rewards(
     return torch.FloatTensor(
         [reward(query, response) for response in responses]
     ).to(self.device)
+
+
+def response_digest(response) -> Optional[bytes]:
+    """
+    Decodes the hex digest a miner returned in a ToHash response.
+
+    Returns:
+    - bytes: The raw digest, or None when the answer is missing, malformed or
+      not DIGEST_SIZE bytes long.
+    """
+    try:
+        digest = bytes.fromhex(response.generated_hash)
+    except (TypeError, ValueError):
+        return None
+    return digest if len(digest) == DIGEST_SIZE else None
+
+
+def score_responses(responses: List, expected: bytes) -> torch.FloatTensor:
+    """
+    Scores ToHash responses against the expected digest. Every received digest
+    is packed into one buffer and compared in a single tensor op; unusable
+    answers become all-zero rows, which no SHA-256 digest matches in practice.
+
+    Args:
+    - responses (List[ToHash]): The responses returned by the miners.
+    - expected (bytes): The raw digest of the nounce that was sent.
+
+    Returns:
+    - torch.FloatTensor: 1.0 for each correct answer, 0.0 otherwise.
+    """
+    if not responses:
+        return torch.zeros(0, dtype=torch.float32)
+    missing = bytes(DIGEST_SIZE)
+    digests = [response_digest(resp_i) or missing for resp_i in responses]
+    buffer = bytearray(b"".join(digests))
+    received = torch.frombuffer(buffer, dtype=torch.uint8)
+    received = received.view(-1, DIGEST_SIZE)
+    expected = torch.frombuffer(bytearray(expected), dtype=torch.uint8)
+    return (received == expected).all(dim=1).to(torch.float32)
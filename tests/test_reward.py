@@ -0,0 +1,69 @@
+import unittest
+from types import SimpleNamespace
+
+import torch
+
+from template.protocol import nounce_digest
+from template.validator.reward import response_digest, score_responses
+
+
+def response(generated_hash):
+    return SimpleNamespace(generated_hash=generated_hash)
+
+
+class ScoreResponsesTestCase(unittest.TestCase):
+    """
+    Tests for scoring ToHash responses against the expected nounce digest.
+    """
+
+    def setUp(self):
+        self.expected = nounce_digest(42)
+
+    def test_response_digest(self):
+        self.assertEqual(
+            response_digest(response(self.expected.hex())), self.expected
+        )
+        self.assertIsNone(response_digest(response(None)))
+        self.assertIsNone(response_digest(response("not hex")))
+        self.assertIsNone(response_digest(response(self.expected.hex()[:-2])))
+
+    def test_correct_answer(self):
+        scores = score_responses(
+            [response(self.expected.hex())], self.expected
+        )
+
+        self.assertTrue(torch.equal(scores, torch.tensor([1.0])))
+
+    def test_wrong_answer(self):
+        scores = score_responses(
+            [response(nounce_digest(43).hex())], self.expected
+        )
+
+        self.assertTrue(torch.equal(scores, torch.tensor([0.0])))
+
+    def test_unusable_answers(self):
+        # None, malformed hex and a truncated digest all score 0 without
+        # shifting the rows of the responses around them.
+        responses = [
+            response(None),
+            response(self.expected.hex()),
+            response("zz" * 32),
+            response(self.expected.hex()[:-2]),
+            response(self.expected.hex()),
+        ]
+
+        scores = score_responses(responses, self.expected)
+
+        self.assertTrue(
+            torch.equal(scores, torch.tensor([0.0, 1.0, 0.0, 0.0, 1.0]))
+        )
+
+    def test_no_responses(self):
+        scores = score_responses([], self.expected)
+
+        self.assertEqual(scores.shape, (0,))
+        self.assertEqual(scores.dtype, torch.float32)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import io
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+from neurons.validator import (
+    TEST_SET_VERSION,
+    generate_key_value_pairs,
+    load_validation_set,
+    save_validation_set,
+)
+
+
+class ValidationSetStorageTestCase(unittest.TestCase):
+    """
+    Tests for the on-disk validation set: the versioned binary format written
+    by save_validation_set and the legacy pickle files it replaced.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "validationset.sav")
+        self.key_value_pairs = generate_key_value_pairs(3, 50)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, seed=None):
+        with open(self.filename, "rb") as file:
+            return load_validation_set(file, seed)
+
+    def test_round_trip(self):
+        save_validation_set(self.filename, 3, self.key_value_pairs)
+
+        self.assertEqual(self.load(), (3, self.key_value_pairs))
+        self.assertEqual(self.load(3), (3, self.key_value_pairs))
+        self.assertFalse(os.path.exists(self.filename + ".tmp"))
+
+    def test_seed_mismatch_skips_payload(self):
+        # The payload is too short for the header's n, so decoding it would
+        # fail; a mismatching seed must return before getting there.
+        header = {"version": TEST_SET_VERSION, "seed": 3, "n": 50}
+        file = io.BytesIO(json.dumps(header).encode() + b"\n" + b"\x00")
+
+        self.assertEqual(load_validation_set(file, 4), (3, None))
+
+    def test_legacy_pickle_converts_hex_digests(self):
+        legacy = {
+            key: value.hex() for key, value in self.key_value_pairs.items()
+        }
+        with open(self.filename, "wb") as file:
+            pickle.dump((5, legacy), file)
+
+        self.assertEqual(self.load(), (5, self.key_value_pairs))
+        self.assertEqual(self.load(6), (5, None))
+
+    def test_unsupported_version(self):
+        header = {"version": TEST_SET_VERSION + 1, "seed": 3, "n": 0}
+        file = io.BytesIO(json.dumps(header).encode() + b"\n")
+
+        with self.assertRaises(ValueError):
+            load_validation_set(file)
+
+
+if __name__ == "__main__":
+    unittest.main()